@@ -1,18 +1,42 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
 import csv
+import functools
 import os
 import subprocess
 import time
 
+import pdfplumber
+from tqdm import tqdm
+
 from src.csv_fields import CSVFields
+from src.readers.ocr_reader import warm_up_tesseract
+
+# ocrmypdf spawns its own Tesseract threads, so keep the pool small
+MAX_WORKERS = min(os.cpu_count() or 1, 4)
+
+
+def has_text_layer(pdf_path: str, max_pages: int = 3) -> bool:
+    """
+    Checks whether any of the first pages already contains extractable text.
+    """
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            return any(page.extract_text() for page in pdf.pages[:max_pages])
+    except Exception:
+        return False
 
 
 def preprocess_pdf(input_path: str) -> str:
     """
     Runs ocrmypdf to clean and deskew the input PDF.
-    Returns path to preprocessed output.
+    Returns path to preprocessed output, or the input path if it is already searchable.
     """
+    if has_text_layer(input_path):
+        print(f"[INFO] Skipping preprocessing of {input_path}, it already has a text layer")
+        return input_path
+
     output_path = input_path.replace(".pdf", "_cleaned.pdf")
     try:
         subprocess.run([
@@ -29,14 +53,16 @@ def preprocess_pdf(input_path: str) -> str:
         return input_path  # Fallback to original
 
 
-def process_pdf(pdf_path: str, preprocess: bool = False) -> dict:
+def process_pdf(pdf_path: str, preprocess: bool = False, page_workers: int | None = None) -> dict:
     """
     Extract all fields from one PDF and return the result dict.
+    page_workers limits the processes used for the pages of this PDF.
     """
+    print(f"[→] Processing {pdf_path}...")
     path = preprocess_pdf(pdf_path) if preprocess else pdf_path
     start = time.perf_counter()
-    fields = CSVFields(path)
-    result = fields.extract_all()
+    with CSVFields(path, max_workers=page_workers) as fields:
+        result = fields.extract_all()
     result["Time (s)"] = round(time.perf_counter() - start, 2)
     return result
 
@@ -46,11 +72,13 @@ def write_results_to_csv(results: list, output_file: str):
         print("[INFO] No results to write.")
         return
 
-    keys = results[0].keys()
+    keys = list(results[0])
+    # Flatten to plain rows once instead of a per-field dict lookup inside DictWriter
+    rows = [[result.get(key, "") for key in keys] for result in results]
     with open(output_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=keys)
-        writer.writeheader()
-        writer.writerows(results)
+        writer = csv.writer(f)
+        writer.writerow(keys)
+        writer.writerows(rows)
 
     print(f"[✔] Results saved to {output_file}")
 
@@ -64,18 +92,29 @@ def main():
 
     files = []
     if os.path.isdir(args.input):
-        files = [os.path.join(args.input, f) for f in os.listdir(args.input) if f.lower().endswith(".pdf")]
+        # Smallest files first, so the first results and progress updates arrive early
+        entries = [
+            entry for entry in os.scandir(args.input)
+            if entry.is_file() and entry.name.lower().endswith(".pdf")
+        ]
+        files = [entry.path for entry in sorted(entries, key=lambda entry: entry.stat().st_size)]
     elif os.path.isfile(args.input):
         files = [args.input]
     else:
         print("[ERROR] Invalid input path.")
         return
 
-    results = []
-    for pdf_file in files:
-        print(f"[→] Processing {pdf_file}...")
-        result = process_pdf(pdf_file, preprocess=args.preprocess)
-        results.append(result)
+    # map() keeps the results in the same order as the input files. When several
+    # PDFs already run in parallel, each one extracts its pages in-process, so
+    # every worker loads Tesseract once at start and keeps it for all its files.
+    # A single PDF fans its pages out to a pool of its own, which warms up itself.
+    page_workers = 1 if len(files) > 1 else None
+    worker = functools.partial(process_pdf, preprocess=args.preprocess, page_workers=page_workers)
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max(1, min(MAX_WORKERS, len(files))),
+            initializer=warm_up_tesseract if page_workers == 1 else None
+    ) as executor:
+        results = list(tqdm(executor.map(worker, files), total=len(files)))
 
     write_results_to_csv(results, args.output)
 
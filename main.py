@@ -9,8 +9,8 @@ pdfs_dir = "./pdfs"
 
 def run():
     filename = pdfs_dir + '/HWT03-001663-A-LowRes.pdf'
-    fields = CSVFields(filename)
-    extracted_data = fields.extract_all()
+    with CSVFields(filename) as fields:
+        extracted_data = fields.extract_all()
     writer = CSVWriter()
     headers = list(extracted_data.keys())
     data = list(extracted_data.values())
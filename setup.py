@@ -23,6 +23,8 @@ setup(
         "pdfplumber",
         "Pillow",
         "ocrmypdf",
+        "numpy",
+        "rapidfuzz",
         "tqdm",  # Optional: used for progress bar in batch processing
     ],
 
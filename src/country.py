@@ -1,13 +1,51 @@
-import json
+import functools
 
+try:
+    import orjson as json
+except ImportError:
+    import json
 
+
+@functools.cache
 def load_country_data(json_path="country_data.json"):
-    with open(json_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Loads the country table; memoized, so each process parses the file only once.
+    """
+    with open(json_path, "rb") as f:
+        return json.loads(f.read())
+
+
+def _build_name_index(data: dict) -> dict:
+    """
+    Maps lowercased country names to (code, info), keeping the first code per name.
+    """
+    index = {}
+    for code, info in data.items():
+        index.setdefault(info["country"].lower(), (code, info))
+    return index
+
+
+def _build_code_index(data: dict) -> dict:
+    """
+    Maps lowercased country codes to (code, info).
+    """
+    return {code.lower(): (code, info) for code, info in data.items()}
 
 
 COUNTRY_DATA = load_country_data()
 
+# Lookup tables for COUNTRY_DATA, so matching a value is a dict get instead of a scan
+_NAME_INDEX = _build_name_index(COUNTRY_DATA)
+_CODE_INDEX = _build_code_index(COUNTRY_DATA)
+
+
+def _name_index(data: dict) -> dict:
+    return _NAME_INDEX if data is COUNTRY_DATA else _build_name_index(data)
+
+
+def _code_index(data: dict) -> dict:
+    return _CODE_INDEX if data is COUNTRY_DATA else _build_code_index(data)
+
 
 def enrich_country_info(text: str, data: dict) -> dict | None:
     """
@@ -23,24 +61,16 @@ def enrich_country_info(text: str, data: dict) -> dict | None:
     """
     text_clean = text.strip().lower()
 
-    # Try match by code (e.g., DE)
-    if text_clean in data:
-        info = data[text_clean]
+    # Try match by code (e.g., DE), then by country name (e.g., Germany)
+    match = _code_index(data).get(text_clean) or _name_index(data).get(text_clean)
+    if match:
+        code, info = match
         return {
-            "Länderkürzel": text_clean.upper(),
+            "Länderkürzel": code,
             "Land": info["country"],
             "EUTPD": "EUTPD" if info["eutpd"] else "-"
         }
 
-    # Try match by country name (e.g., Germany)
-    for code, info in data.items():
-        if info["country"].lower() == text_clean:
-            return {
-                "Länderkürzel": code,
-                "Land": info["country"],
-                "EUTPD": "EUTPD" if info["eutpd"] else "-"
-            }
-
     return None
 
 
@@ -56,11 +86,12 @@ def get_country_info_by_code(code: str, data: dict) -> dict | None:
 
 
 def get_country_info_by_name(name: str, data: dict) -> dict | None:
-    for code, info in data.items():
-        if info["country"].lower() == name.lower():
-            return {
-                "Länderkürzel": code,
-                "Land": info["country"],
-                "EUTPD": "EUTPD" if info["eutpd"] else "-"
-            }
+    match = _name_index(data).get(name.lower())
+    if match:
+        code, info = match
+        return {
+            "Länderkürzel": code,
+            "Land": info["country"],
+            "EUTPD": "EUTPD" if info["eutpd"] else "-"
+        }
     return None
@@ -1,88 +1,54 @@
-import inspect
 import time
-from typing import Dict, List, Tuple
+from collections import namedtuple
+from typing import Dict, List, Optional
 
 import pdfplumber
 
 from src.data_extractor import DataExtractor
 from src.match_strategy import RegexMatch
 
+# Tesseract options per kind of field: each crop holds a single line of text,
+# and code-like fields only ever contain a small alphabet
+_CODE_CONFIG = "--psm 7 --oem 1 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-"
+_DATE_CONFIG = "--psm 7 --oem 1 -c tessedit_char_whitelist=0123456789."
+_VERSION_CONFIG = "--psm 8 --oem 1 -c tessedit_char_whitelist=()0123456789"
+_LINE_CONFIG = "--psm 7 --oem 1"
 
-class CSVFields:
+
+def _country_fields(value: str) -> Dict[str, str]:
     """
-    Extracts all field values from a PDF using registered get_ methods.
+    Land, Laenderkuerzel and EUTPD are printed in the same box, so it is read once
+    and its text fills all three columns, as the three separate reads did. Those
+    only fell back to the country table for a column whose own read was empty,
+    and reading the same box they were always empty together.
     """
+    return {
+        "Land": value,
+        "Laenderkuerzel": value,
+        "EUTPD": value,
+    }
 
-    def __init__(self, filename: str):
-        """
-        :param filename:
-        """
-        self.filename = filename
-        self.extractor = DataExtractor(filename)
-        self._total_pages = None  # Lazy-loaded
-
-    @property
-    def total_pages(self) -> int:
-        """Cache page count to avoid repeated PDF opening"""
-        if self._total_pages is None:
-            with pdfplumber.open(self.filename) as pdf:
-                self._total_pages = len(pdf.pages)
-        return self._total_pages
-
-    def extract_all(self) -> Dict[str, str]:
-        """
-        Automatically calls all methods that start with 'get_' and merges their dict results.
-        :return: dict: {"Field Name": "Extracted Value"}
-        """
-        start = time.perf_counter()
-
-        results = {
-            'File': self.filename,
-            'Total Pages': self.total_pages,
-        }
-
-        # Get all get_* methods dynamically
-        for name, method in inspect.getmembers(self, inspect.ismethod):
-            if name.startswith('get_') and name != 'get_':
-                try:
-                    results.update(method())
-                except Exception as e:
-                    results[name[4:]] = f"ERROR: {str(e)}"
 
-        end = time.perf_counter()
-        elapsed_seconds = round(end - start, 2)
-        results['Time (s)'] = elapsed_seconds
+# label: column name; page: page index, or a callable taking the page count;
+# boxes: candidate boxes, tried in order; matcher: validates text-layer results
+# (a fullmatch, unless built with search=True for lookaheads and unanchored patterns);
+# tesseract_config: options for OCR; expand: turns the value into several columns
+FieldSpec = namedtuple(
+    'FieldSpec',
+    'label page boxes matcher tesseract_config expand',
+    defaults=(None,)
+)
 
-        return results
 
-    def _extract_field(
-            self,
-            label: str,
-            page: int,
-            positions: List[Tuple[int, int, int, int]],
-            regex: str
-    ) -> Dict[str, str]:
-        """Unified extraction logic for all fields"""
-        return {
-            label: self.extractor.extract_text(
-                page=page,
-                boxes=positions,
-                match_strategy=RegexMatch(regex)
-            )
-        }
+class CSVFields:
+    """
+    Extracts all field values from a PDF as declared in _FIELDS.
+    """
 
-    def get_hwt_number(self) -> dict:
-        """
-        @TODO
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "HWT03-001663-A",
-            "HWT03-002064-A",
-            "HWT03-002183-C",
-            "HWT03-005231-A"
-        ]
-        return self._extract_field(
+    # Matchers are compiled once at import and shared by every CSVFields instance
+    _FIELDS: List[FieldSpec] = [
+        # e.g. "HWT03-001663-A", "HWT03-002064-A", "HWT03-002183-C", "HWT03-005231-A"
+        FieldSpec(
             'HWT Nummer',
             0,
             [
@@ -92,297 +58,183 @@ class CSVFields:
                 (90, 858, 552, 901),
                 (136, 1287, 828, 1351)
             ],
-            r"^HWT03-\d{6}-[A-Z]$"
-        )
-
-    def get_packungsart(self) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "HL - OC",
-            "HL - SOC",
-            "HL - SQ"
-        ]
-        return self._extract_field(
+            RegexMatch(r"^HWT03-\d{6}-[A-Z]$", prefix="HWT03-"),
+            _CODE_CONFIG
+        ),
+        # e.g. "HL - OC", "HL - SOC", "HL - SQ"
+        FieldSpec(
             'Packungsart',
             0,
             [
                 (925, 98, 1164, 148),
             ],
-            r"^HL\s*-\s*[A-Z]{2,3}$"
-        )
-
-    def get_gitternetz(self) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "03-0333",
-            "03-1025",
-            "03-0099",
-            "03-1025"
-        ]
-        return self._extract_field(
+            RegexMatch(r"^HL\s*-\s*[A-Z]{2,3}$", prefix="HL"),
+            _LINE_CONFIG
+        ),
+        # e.g. "03-0333", "03-1025", "03-0099"
+        FieldSpec(
             'Gitternetz',
             0,
             [
                 (1207, 99, 1447, 148),
             ],
-            r"^03-\d{4}$"
-        )
-
-    def get_gitternetz_version(self) -> dict:
-        """
-        @TODO
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "AOJ--0333-H",
-            "A03-1025-F",
-            "A03-0099-H",
-            "A03-1025-F"
-        ]
-        return self._extract_field(
+            RegexMatch(r"^03-\d{4}$", prefix="03-"),
+            _CODE_CONFIG
+        ),
+        # e.g. "AOJ--0333-H", "A03-1025-F", "A03-0099-H"
+        FieldSpec(
             'Gitternetz Version',
             0,
             [
                 (103, 252, 190, 263)
             ],
-            r".(.)$"
-        )
-
-    def _enrich_country_fields(self, visited: set) -> dict:
-        """
-        Attempts to fill Land, Länderkürzel, and EUTPD from whatever is available.
-        Avoids infinite recursion by tracking visited field methods.
-        """
-        from src.country import enrich_country_info, COUNTRY_DATA
-
-        current_values = {
-            "Land": getattr(self, "_land", None),
-            "Länderkürzel": getattr(self, "_länderkurzel", None),
-            "EUTPD": getattr(self, "_eutpd", None),
-        }
-
-        for val in current_values.values():
-            if val and val != "-":
-                enriched = enrich_country_info(val, COUNTRY_DATA)
-                if enriched:
-                    return {
-                        k: enriched[k]
-                        for k in ["Land", "Länderkürzel", "EUTPD"]
-                        if k not in visited  # only return those not visited
-                    }
-
-        return {}
-
-    def _get_country_field(
-            self,
-            field_name: str,
-            label: str,
-            box: Tuple[int, int, int, int],
-            regex: str,
-            visited: set | None = None
-    ) -> dict:
-        """
-        Extracts and enriches country-related fields: Land, Laenderkuerzel, EUTPD.
-        """
-        if visited is None:
-            visited = set()
-        visited.add(label)
-
-        result = self._extract_field(
-            label,
+            RegexMatch(r".(.)$", search=True),
+            _CODE_CONFIG
+        ),
+        # e.g. "EUTPD 11-1 PL - SET 2", "MOLDOVA - SET 1", "CH -SET 2"; free text, any value is accepted
+        FieldSpec(
+            'Land',
             0,
-            [box],
-            regex
-        )
-
-        value = result[label]
-        setattr(self, f"_{field_name}", value)
-
-        if not value or value.strip() == "-":
-            enriched = self._enrich_country_fields(visited)
-            if label in enriched:
-                value = enriched[label]
-                result[label] = value
-                setattr(self, f"_{field_name}", value)
-
-        return result
-
-    def get_eutpd(self, visited=None) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "EUTPD 11-1 PL - SET 2",
-            "MOLDOVA - SET 1",
-            "EUTPD 11-1 AT - SET 2",
-            "CH -SET 2"
-        ]
-
-        return self._get_country_field(
-            field_name="eutpd",
-            label="EUTPD",
-            box=(3581, 98, 3669, 148),
-            regex=r"(?i)EUTPD",
-            visited=visited
-        )
-
-    def get_laenderkuerzel(self, visited=None) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "EUTPD 11-1 PL - SET 2",
-            "MOLDOVA - SET 1",
-            "EUTPD 11-1 AT - SET 2",
-            "CH -SET 2"
-        ]
-
-        return self._get_country_field(
-            field_name="laenderkuerzel",
-            label="Laenderkuerzel",
-            box=(3581, 98, 3669, 148),
-            regex=r"",
-            visited=visited
-        )
-
-    def get_land(self, visited=None) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "EUTPD 11-1 PL - SET 2",
-            "MOLDOVA - SET 1",
-            "EUTPD 11-1 AT - SET 2",
-            "CH -SET 2"
-        ]
-
-        return self._get_country_field(
-            field_name="land",
-            label="Land",
-            box=(3581, 98, 3669, 148),
-            regex=r"",
-            visited=visited
-        )
-
-    def get_set(self) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "SET 2",
-            "EUTPD 11-1 PL - SET 2",
-            "MOLDOVA - SET 1",
-            "EUTPD 11-1 AT - SET 2",
-            "CH -SET 2",
-        ]
-        return self._extract_field(
+            [
+                (3581, 98, 3669, 148)
+            ],
+            None,
+            _LINE_CONFIG,
+            expand=_country_fields
+        ),
+        # e.g. "SET 2", "EUTPD 11-1 PL - SET 2", "MOLDOVA - SET 1"
+        FieldSpec(
             'Set',
             0,
             [
                 (3735, 98, 3915, 148)
             ],
-            r"(?i)\bSET\s*\d+\b"
-        )
-
-    def get_freigabedatum(self) -> dict:
-        """
-        @TODO
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "09.11.2020",
-            "27.11.2017",
-            "11.08.2017",
-            "13.03.2017"
-        ]
-        return self._extract_field(
+            RegexMatch(r"(?i)\bSET\s*\d+\b", search=True),
+            _LINE_CONFIG
+        ),
+        # e.g. "09.11.2020", "27.11.2017", "11.08.2017", "13.03.2017"
+        FieldSpec(
             'Freigabedatum',
             0,
             [
                 (443, 3164, 634, 3192)
             ],
-            r"^\d{2}\.\d{2}\.\d{4}$"
-        )
-
-    def get_software(self) -> dict:
-        """
-        @TODO
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "Adobe Illustrator CC (14)",
-            "Adobe Illustrator CC (14)",
-            "Adobe Illustrator CC (14)",
-            "Adobe Illustrator CC (14)"
-        ]
-        return self._extract_field(
+            RegexMatch(r"^\d{2}\.\d{2}\.\d{4}$"),
+            _DATE_CONFIG
+        ),
+        # e.g. "Adobe Illustrator CC (14)"
+        FieldSpec(
             'Software',
             0,
             [
                 (438, 3222, 864, 3259)  # (14)
             ],
-            r"^[A-Za-z\s]+(?=\s*\(\d+\))"
-        )
-
-    def get_software_version(self) -> dict:
-        """
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "Adobe Illustrator CC (14)",
-            "Adobe Illustrator CC (14)",
-            "Adobe Illustrator CC (14)",
-            "Adobe Illustrator CC (14)"
-        ]
-        return self._extract_field(
+            RegexMatch(r"^[A-Za-z\s]+(?=\s*\(\d+\))", search=True),
+            _LINE_CONFIG
+        ),
+        # e.g. "Adobe Illustrator CC (14)"
+        FieldSpec(
             'Software Version',
             0,
             [
                 (799, 3222, 864, 3259)  # (14)
             ],
-            r"^\(\d{2}\)$"
-        )
-
-    def get_chw_calculation(self) -> dict:
-        """
-        If the PDF has 3 pages it is always the second page, else doesn't exist!
-
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "CHW03-0099-H",
-            "CHW03-0333-EU",
-        ]
-        return self._extract_field(
+            RegexMatch(r"^\(\d{2}\)$"),
+            _VERSION_CONFIG
+        ),
+        # e.g. "CHW03-0099-H", "CHW03-0333-EU"
+        # If the PDF has 3 pages it is always the second page, else doesn't exist!
+        FieldSpec(
             'CHW Calculation',
-            1 if self.total_pages == 3 else 0,
+            lambda total_pages: 1 if total_pages == 3 else 0,
             [
                 (176, 1285, 990, 1350)
             ],
-            r"^CHW03-\d{4}-[A-Z]{1,2}$"
-        )
-
-    def get_hwc_calculation(self) -> dict:
-        """
-        It is always the last page whether 2 pages or 3 pages!
-
-        :return: dictionary containing field name and field value
-        """
-        likely_results = [
-            "HWC03-001662-A",
-            "HWC03-001810-A",
-            "HWC03-001940-A",
-            "HWC03-002923-A"
-        ]
-        return self._extract_field(
+            RegexMatch(r"^CHW03-\d{4}-[A-Z]{1,2}$", prefix="CHW03-"),
+            _CODE_CONFIG
+        ),
+        # e.g. "HWC03-001662-A", "HWC03-001810-A", "HWC03-001940-A", "HWC03-002923-A"
+        # It is always the last page whether 2 pages or 3 pages!
+        FieldSpec(
             'HWC Calculation',
-            self.total_pages - 1,
+            lambda total_pages: total_pages - 1,
             [
                 (130, 1285, 832, 1350)
             ],
-            r"^HWC03-\d{6}-[A-Z]$"
+            RegexMatch(r"^HWC03-\d{6}-[A-Z]$", prefix="HWC03-"),
+            _CODE_CONFIG
+        ),
+    ]
+
+    def __init__(self, filename: str, max_workers: Optional[int] = None):
+        """
+        :param filename:
+        :param max_workers: processes used to extract pages in parallel; 1 keeps it in-process
+        """
+        self.filename = filename
+        self.max_workers = max_workers
+        # Open the PDF once and share the handle with the extractor
+        self._pdf = pdfplumber.open(filename)
+        self.extractor = DataExtractor(filename, pdf=self._pdf)
+        # Read once up front; needed to resolve the page of every field
+        self.total_pages = len(self._pdf.pages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the extractor and the shared PDF handle."""
+        self.extractor.close()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    def extract_all(self) -> Dict[str, str]:
+        """
+        Extracts every field in _FIELDS and merges them in declaration order.
+        :return: dict: {"Field Name": "Extracted Value"}
+        """
+        start = time.perf_counter()
+
+        results = {
+            'File': self.filename,
+            'Total Pages': self.total_pages,
+        }
+
+        # Group the fields by page, so every page is rendered and read by one worker
+        pages: Dict[int, List[FieldSpec]] = {}
+        for spec in self._FIELDS:
+            pages.setdefault(self._resolve_page(spec), []).append(spec)
+
+        texts = self.extractor.extract_many(
+            {
+                page: [(spec.boxes, spec.matcher, spec.tesseract_config) for spec in specs]
+                for page, specs in pages.items()
+            },
+            max_workers=self.max_workers
         )
+        values = {
+            spec.label: text
+            for page, specs in pages.items()
+            for spec, text in zip(specs, texts[page])
+        }
+
+        for spec in self._FIELDS:
+            value = values[spec.label]
+            if spec.expand and not value.startswith("ERROR:"):
+                results.update(spec.expand(value))
+            else:
+                results[spec.label] = value
+
+        end = time.perf_counter()
+        elapsed_seconds = round(end - start, 2)
+        results['Time (s)'] = elapsed_seconds
+
+        return results
+
+    def _resolve_page(self, spec: FieldSpec) -> int:
+        """Page index of a field, resolving page-count dependent specs"""
+        return spec.page(self.total_pages) if callable(spec.page) else spec.page
@@ -1,25 +1,74 @@
-from typing import Tuple, List, Optional, Literal, Union
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Tuple, List, Optional, Literal, Union
 
+import numpy as np
 import pdfplumber
 from pdfplumber import PDF
 
 from src.match_strategy import MatchStrategy
-from src.readers.ocr_reader import OcrReader
-from src.readers.pdf_reader import PdfReader
+from src.readers.ocr_reader import BOX_DPI, MAX_CACHED_IMAGES, OcrReader, warm_up_tesseract
+from src.readers.pdf_reader import PdfReader, find_page
 from src.logger import log
 
+# Whitespace removed before judging whether a text layer is usable
+_WHITESPACE_BYTES = b" \n\t\r"
+
+# Boxes, match strategy and tesseract config of one field to extract
+FieldRequest = Tuple[List[Tuple[int, int, int, int]], Optional[MatchStrategy], Optional[str]]
+
+
+def _get_max_workers(num_tasks: int) -> int:
+    """Number of worker processes for num_tasks independent pages."""
+    return max(1, min(num_tasks, os.cpu_count() or 1))
+
+
+def _init_worker() -> None:
+    """Process pool initializer: load Tesseract before the first page arrives."""
+    warm_up_tesseract()
+
+
+def _extract_page(filename: str, page: int, requests: List[FieldRequest]) -> Tuple[int, List[str]]:
+    """
+    Worker entry point for DataExtractor.extract_many. Opens its own PDF,
+    since pdfplumber handles cannot be shared across processes, and only
+    parses the page it works on.
+
+    Args:
+        filename: Path to the PDF file
+        page: Zero-based page index
+        requests: Fields to extract from the page
+
+    Returns:
+        The page index and the extracted text of each field, in request order
+    """
+    with DataExtractor(filename, pages=[page]) as extractor:
+        return page, extractor.extract_page(page, requests)
+
 
 class DataExtractor:
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, pdf: Optional[PDF] = None, pages: Optional[List[int]] = None):
         """
         Initialize the DataExtractor with a file to process.
 
         Args:
             filename: Path to the PDF file to extract data from
+            pdf: Optional already opened PDF; it stays owned by the caller
+            pages: Optional zero-based pages to restrict parsing to when the PDF is
+                opened here; other pages are treated as missing
         """
         self.filename = filename
-        self._cached_pdf = None  # Cache the PDF object for multiple operations
-        self._fallback_logged_pages = set()
+        self._pages = pages
+        self._cached_pdf = pdf  # Cache the PDF object for multiple operations
+        self._owns_pdf = pdf is None
+        # Readability and chosen reader per page, so the page text is only parsed once
+        self._readable_cache: Dict[int, bool] = {}
+        self._reader_for_page: Dict[int, Union[PdfReader, OcrReader]] = {}
+        # One reader of each kind per file, so their caches last the whole session
+        self._pdf_reader: Optional[PdfReader] = None
+        self._ocr_reader: Optional[OcrReader] = None
+        # Raw text per (reader type, page, box, tesseract config, dpi), so fields sharing a box only read it once
+        self._box_text_cache: Dict[tuple, Optional[str]] = {}
 
     def __enter__(self):
         """Support context manager protocol."""
@@ -31,23 +80,64 @@ class DataExtractor:
 
     def close(self):
         """Close any open resources."""
+        if self._pdf_reader is not None:
+            self._pdf_reader.close()
+            self._pdf_reader = None
+        if self._ocr_reader is not None:
+            self._ocr_reader.close()
+            self._ocr_reader = None
         if self._cached_pdf is not None:
-            self._cached_pdf.close()
+            if self._owns_pdf:
+                self._cached_pdf.close()
             self._cached_pdf = None
+        self._box_text_cache.clear()
+        self._readable_cache.clear()
+        self._reader_for_page.clear()
 
     def _get_pdf(self) -> PDF:
         """Get the PDF object, using cached version if available."""
         if self._cached_pdf is None:
             try:
-                self._cached_pdf = pdfplumber.open(self.filename)
+                self._cached_pdf = pdfplumber.open(
+                    self.filename,
+                    pages=[p + 1 for p in self._pages] if self._pages else None
+                )
+                self._owns_pdf = True
             except Exception as e:
                 log(f"Failed to open PDF file {self.filename}: {e}")
                 raise
         return self._cached_pdf
 
+    def _get_pdf_reader(self) -> PdfReader:
+        """Get the PdfReader for this file, creating it on first use."""
+        if self._pdf_reader is None:
+            # Read from the already parsed PDF instead of opening it again
+            self._pdf_reader = PdfReader(self.filename, pdf=self._get_pdf())
+        return self._pdf_reader
+
+    def _get_ocr_reader(self) -> OcrReader:
+        """Get the OcrReader for this file, creating it on first use."""
+        if self._ocr_reader is None:
+            self._ocr_reader = OcrReader(self.filename)
+        return self._ocr_reader
+
     def _is_page_readable(self, page: int) -> bool:
         """
-        Check if a page contains extractable text.
+        Check if a page contains extractable text, caching the result per page.
+
+        Args:
+            page: Zero-based page index
+
+        Returns:
+            bool: True if page contains extractable text, False otherwise
+        """
+        if page not in self._readable_cache:
+            self._readable_cache[page] = self._check_page_readable(page)
+        return self._readable_cache[page]
+
+    def _check_page_readable(self, page: int) -> bool:
+        """
+        Parse the text layer of a page and decide whether it is usable.
 
         Args:
             page: Zero-based page index
@@ -56,29 +146,25 @@ class DataExtractor:
             bool: True if page contains extractable text, False otherwise
         """
         try:
-            pdf = self._get_pdf()
-            if page >= len(pdf.pages):
-                log(f"Page {page + 1} is out of range (total pages: {len(pdf.pages)})")
+            page_obj = find_page(self._get_pdf(), page)
+            if page_obj is None:
+                log(f"Page {page + 1} is out of range or not opened in {self.filename}")
                 return False
 
-            page_obj = pdf.pages[page]
-
             # Method 1: Try extract_text
             text = page_obj.extract_text()
             # No text at all? Definitely not readable.
             if not text or not text.strip():
                 return False
 
-            # Method 2: Count unique characters
-            # cleaned = text.strip().replace("\n", "").replace(" ", "")
-            cleaned = text.replace("\n", "").replace(" ", "")
+            # Method 2: Count unique characters, on the UTF-8 bytes so a
+            # histogram replaces building a set of one-character strings
+            cleaned = text.encode("utf-8", "ignore").translate(None, _WHITESPACE_BYTES)
             # Heuristic: Short length or too few distinct characters
-            if len(cleaned) < 10 or len(set(cleaned)) <= 3:
+            if len(cleaned) < 10:
                 return False
-
-            # Method 3: Check if any characters exist on the page
-            chars = page_obj.chars
-            if not chars or len(chars) < 5:
+            counts = np.bincount(np.frombuffer(cleaned, dtype=np.uint8), minlength=256)
+            if np.count_nonzero(counts) <= 3:
                 return False
 
             return True
@@ -88,7 +174,21 @@ class DataExtractor:
 
     def get_best_reader(self, page: int) -> Union[PdfReader, OcrReader]:
         """
-        Determine the best reader for a given page (PDF or OCR).
+        Determine the best reader for a given page (PDF or OCR), once per page.
+
+        Args:
+            page: Zero-based page index
+
+        Returns:
+            A reader instance (PdfReader or OcrReader)
+        """
+        if page not in self._reader_for_page:
+            self._reader_for_page[page] = self._choose_reader(page)
+        return self._reader_for_page[page]
+
+    def _choose_reader(self, page: int) -> Union[PdfReader, OcrReader]:
+        """
+        Pick the PdfReader for pages with a usable text layer, the OcrReader otherwise.
 
         Args:
             page: Zero-based page index
@@ -99,21 +199,84 @@ class DataExtractor:
         try:
             if self._is_page_readable(page):
                 log(f"Using PdfReader for page {page + 1} of {self.filename}")
-                return PdfReader(self.filename)
-            else:
-                if page not in self._fallback_logged_pages:
-                    log(f"Falling back to OcrReader for page {page + 1} of {self.filename}")
-                    self._fallback_logged_pages.add(page)
+                return self._get_pdf_reader()
+            log(f"Falling back to OcrReader for page {page + 1} of {self.filename}")
         except Exception as e:
             log(f"Error determining best reader for page {page + 1}, falling back to OCR: {e}")
-        return OcrReader(self.filename)
+        return self._get_ocr_reader()
+
+    def _raw_text_for_box(
+            self,
+            reader: Union[PdfReader, OcrReader],
+            page: int,
+            box: Tuple[int, int, int, int],
+            tesseract_config: Optional[str] = None,
+            dpi: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Read the raw text of a box, caching the result per (reader type, page, box, config, dpi).
+
+        Args:
+            reader: Reader chosen for the page
+            page: Zero-based page index
+            box: Bounding box (x0, y0, x1, y1)
+            tesseract_config: Tesseract options, only used by the OcrReader
+            dpi: Render resolution, only used by the OcrReader
+
+        Returns:
+            Text returned by the reader, or None if nothing was read
+        """
+        is_ocr = isinstance(reader, OcrReader)
+        ocr_options = (tesseract_config, dpi) if is_ocr else None
+        key = (type(reader), page, tuple(box), ocr_options)
+        if key not in self._box_text_cache:
+            if is_ocr:
+                text = reader.read_text_from_box(page, box, config=tesseract_config, dpi=dpi or BOX_DPI)
+            else:
+                text = reader.read_text_from_box(page, box)
+            self._box_text_cache[key] = text
+        return self._box_text_cache[key]
+
+    def _read_first_box(
+            self,
+            reader: Union[PdfReader, OcrReader],
+            page: int,
+            boxes: List[Tuple[int, int, int, int]],
+            match_strategy: Optional[MatchStrategy] = None,
+            tesseract_config: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Try the boxes in order and return the first text the reader finds.
+
+        Args:
+            reader: Reader to read the boxes with
+            page: Zero-based page index
+            boxes: List of bounding boxes (x0, y0, x1, y1) to try
+            match_strategy: Optional strategy the text has to satisfy
+            tesseract_config: Tesseract options, only used by the OcrReader
+
+        Returns:
+            Stripped text of the first matching box, or None if no box matched
+        """
+        # Render once per field, at the lowest resolution its boxes allow
+        dpi = reader.choose_dpi(boxes) if isinstance(reader, OcrReader) else None
+        for box in boxes:
+            try:
+                text = self._raw_text_for_box(reader, page, box, tesseract_config, dpi)
+                if text and (not match_strategy or match_strategy.matches(text)):
+                    return text.strip()
+            except Exception as e:
+                log(f"Failed to read from box {box} on page {page + 1}: {e}")
+        return None
 
     def extract_text(
             self,
             page: int,
             boxes: List[Tuple[int, int, int, int]],
             match_strategy: Optional[MatchStrategy] = None,
-            fallback: str = "-"
+            fallback: str = "-",
+            tesseract_config: Optional[str] = None,
+            page_words: bool = False
     ) -> str:
         """
         Extract text from specified boxes on a page using the appropriate reader.
@@ -123,6 +286,10 @@ class DataExtractor:
             boxes: List of bounding boxes (x0, y0, x1, y1) to try
             match_strategy: Optional strategy to validate extracted text
             fallback: Default value to return if no text is found
+            tesseract_config: Tesseract options used if the page needs OCR
+            page_words: If no OCR crop gives a result, try the words of one OCR pass
+                over the whole page. That pass costs several seconds, so it only pays
+                off as a last resort on pages with several fields.
 
         Returns:
             Extracted text that matches criteria, or fallback value if none found
@@ -130,24 +297,136 @@ class DataExtractor:
         if not boxes:
             return fallback
 
-        reader = None
+        # Text layer value that failed validation, returned if OCR cannot do better
+        layer_text = None
         try:
             reader = self.get_best_reader(page)
+            has_text_layer = isinstance(reader, PdfReader)
 
-            for box in boxes:
-                try:
-                    text = reader.read_text_from_box(page, box)
-                    # if text and (not match_strategy or match_strategy.matches(text)):
-                    if text is not None:
-                        return text.strip()
-                except Exception as e:
-                    log(f"Failed to read from box {box} on page {page + 1}: {e}")
-                    continue
+            if has_text_layer:
+                # The text layer is cheap to read, but only trust it if it matches
+                text = self._read_first_box(reader, page, boxes, match_strategy)
+                if text is not None:
+                    return text
+                layer_text = self._read_first_box(reader, page, boxes)
+                log(f"No matching text layer on page {page + 1} of {self.filename}, falling back to OCR")
+                reader = self._get_ocr_reader()
+
+            # On pages with a text layer OCR has to match, like the text layer did,
+            # even if the boxes were empty there; on pages without a text layer
+            # the first crop with text is returned, as before
+            text = self._read_first_box(
+                reader,
+                page,
+                boxes,
+                match_strategy=match_strategy if has_text_layer else None,
+                tesseract_config=tesseract_config
+            )
+            if text is not None:
+                return text
+
+            # Last resort: the words of one OCR pass over the whole page, cached for
+            # all fields of the page. The pass ignores the field's tesseract config,
+            # so its words are only taken when a match strategy can vouch for them.
+            if page_words and match_strategy is not None:
+                for text in reader.read_text_from_boxes(page, boxes):
+                    if text and match_strategy.matches(text):
+                        return text
 
         except Exception as e:
             log(f"Error during text extraction on page {page + 1}: {e}")
-        finally:
-            if hasattr(reader, 'close'):
-                reader.close()
 
-        return fallback
+        return layer_text if layer_text is not None else fallback
+
+    def extract_page(self, page: int, requests: List[FieldRequest]) -> List[str]:
+        """
+        Extract several fields from one page.
+
+        Args:
+            page: Zero-based page index
+            requests: Fields to extract from the page
+
+        Returns:
+            The extracted text of each field, in request order
+        """
+        # The whole-page OCR fallback is only worth its cost if several fields share it
+        page_words = len(requests) > 1
+        return [
+            self.extract_text(
+                page,
+                boxes,
+                match_strategy=match_strategy,
+                tesseract_config=tesseract_config,
+                page_words=page_words
+            )
+            for boxes, match_strategy, tesseract_config in requests
+        ]
+
+    def _prefetch_ocr_pages(self, page_requests: Dict[int, List[FieldRequest]]) -> None:
+        """
+        Render the pages that need OCR up front, one Poppler call per resolution
+        instead of one call per page, at the resolutions their field crops are
+        read at. Only as many renders as the memory cache holds are prefetched.
+
+        Args:
+            page_requests: Fields that will be extracted in-process, keyed by zero-based page index
+        """
+        renders = []
+        for page in sorted(page_requests):
+            if self._is_page_readable(page):
+                continue
+            for boxes, _, _ in page_requests[page]:
+                render = (page, OcrReader.choose_dpi(boxes))
+                if render not in renders:
+                    renders.append(render)
+
+        pages_by_dpi: Dict[int, List[int]] = {}
+        for page, dpi in renders[:MAX_CACHED_IMAGES]:
+            pages_by_dpi.setdefault(dpi, []).append(page)
+
+        for dpi, pages in pages_by_dpi.items():
+            try:
+                self._get_ocr_reader().prefetch_pages(pages, dpi)
+            except Exception as e:
+                log(f"Failed to prefetch pages {[p + 1 for p in pages]} of {self.filename}: {e}")
+
+    def extract_many(
+            self,
+            page_requests: Dict[int, List[FieldRequest]],
+            max_workers: Optional[int] = None
+    ) -> Dict[int, List[str]]:
+        """
+        Extract fields from several pages, processing the pages in parallel.
+
+        Args:
+            page_requests: Fields to extract, keyed by zero-based page index
+            max_workers: Number of worker processes; defaults to one per page up to
+                the CPU count. With 1 (or a single page) everything runs in-process.
+
+        Returns:
+            The extracted text of each field, keyed by page, in request order
+        """
+        workers = max_workers or _get_max_workers(len(page_requests))
+        if workers <= 1 or len(page_requests) <= 1:
+            # Worker processes render their own page in parallel, so only the
+            # in-process path benefits from rendering the pages in one go
+            self._prefetch_ocr_pages(page_requests)
+            return {page: self.extract_page(page, requests) for page, requests in page_requests.items()}
+
+        # Only load Tesseract in the workers when some page has no usable text layer
+        needs_ocr = any(not self._is_page_readable(page) for page in page_requests)
+        initializer = _init_worker if needs_ocr else None
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+            futures = {
+                executor.submit(_extract_page, self.filename, page, requests): page
+                for page, requests in page_requests.items()
+            }
+            for future in as_completed(futures):
+                page = futures[future]
+                try:
+                    _, results[page] = future.result()
+                except Exception as e:
+                    log(f"Failed to extract page {page + 1} of {self.filename}: {e}")
+                    results[page] = [f"ERROR: {str(e)}"] * len(page_requests[page])
+        return results
@@ -1,4 +1,31 @@
+import functools
+import os
+import re
 from abc import ABC, abstractmethod
+from typing import Optional, Union
+
+# Prefer the linear-time RE2 engine when installed; PDFEXTRACT_USE_RE2=0 disables it
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+USE_RE2 = re2 is not None and os.environ.get("PDFEXTRACT_USE_RE2", "1") != "0"
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_pattern(pattern: str):
+    """
+    Compiles a pattern with RE2 if enabled, otherwise with the stdlib re module.
+    Patterns RE2 does not support (e.g. lookaheads) fall back to re.
+    Cached, so matchers rebuilt from their pattern (e.g. after pickling) share one compiled regex.
+    """
+    if USE_RE2:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
 
 
 class MatchStrategy(ABC):
@@ -8,10 +35,27 @@ class MatchStrategy(ABC):
 
 
 class RegexMatch(MatchStrategy):
-    def __init__(self, pattern: str):
-        import re
-        self.pattern = pattern
-        self.regex = re.compile(pattern)
+    def __init__(self, pattern: Union[str, re.Pattern], prefix: Optional[str] = None, search: bool = False):
+        """
+        :param pattern: regex string or an already compiled pattern
+        :param prefix: literal every match starts with, checked before running the regex
+        :param search: accept the text if the pattern matches anywhere in it, instead
+            of requiring it to match the whole text (for lookaheads and unanchored patterns)
+        """
+        self.regex = compile_pattern(pattern) if isinstance(pattern, str) else pattern
+        self.pattern = self.regex.pattern
+        self.prefix = prefix
+        self.search = search
+        # bound once, called on every candidate
+        self._match = self.regex.search if search else self.regex.fullmatch
+
+    def __reduce__(self):
+        # Rebuild from the pattern string, so matchers can be sent to worker processes
+        return RegexMatch, (self.pattern, self.prefix, self.search)
 
     def matches(self, text: str) -> bool:
-        return bool(self.regex.fullmatch(text.strip()))
+        text = text.strip()
+        # Cheap rejection of most candidates without touching the regex engine
+        if self.prefix and not text.startswith(self.prefix):
+            return False
+        return self._match(text) is not None
@@ -1,74 +1,460 @@
+import hashlib
 import os
 import re
-from difflib import SequenceMatcher
-from typing import Tuple, Optional, Dict
+import shlex
+from typing import Tuple, Optional, Dict, Iterable, List
 
+import numpy as np
 import pytesseract
 from PIL import Image, ImageDraw
 from pdf2image import convert_from_path
+from rapidfuzz import fuzz, process
 
 from src.readers.base_reader import BoxReader
 from src.logger import log
 
+# tesserocr keeps the Tesseract model loaded in-process instead of spawning
+# a tesseract subprocess per crop; pytesseract is used when it is missing
+try:
+    from tesserocr import PyTessBaseAPI, PSM, OEM, RIL, iterate_level
+except ImportError:
+    PyTessBaseAPI = None
+
+# Page segmentation / engine used when a caller gives no field-specific config
+DEFAULT_TESSERACT_CONFIG = "--psm 6 --oem 1"
+# Whole-page pass for read_text_from_boxes: fields are scattered over the
+# page, so sparse-text segmentation finds them better than a uniform block
+PAGE_TESSERACT_CONFIG = "--psm 11 --oem 1"
+
+# Boxes are given in pixels of a page rendered at this resolution
+BOX_DPI = 300
+# Render resolutions to choose from (low, medium, high). Boxes whose shorter side,
+# measured at the low resolution, is below SMALL_BOX_PX get the high one; from
+# LARGE_BOX_PX on the low one is enough; everything in between gets the medium one.
+# Every tier keeps at least 32 rendered pixels of box height, which spreads the
+# field boxes (11 to 65 px tall at BOX_DPI) over all three tiers.
+DPI_STEPS = (150, 200, 300)
+SMALL_BOX_PX = 24
+LARGE_BOX_PX = 32
+# Rendered pages kept in memory at once
+MAX_CACHED_IMAGES = 4
+# Renders can also be kept on disk, so later runs skip Poppler. Off by default;
+# PDFEXTRACT_RASTER_CACHE=<dir> enables it, and the least recently used renders
+# are deleted once it outgrows PDFEXTRACT_RASTER_CACHE_MB megabytes
+RASTER_CACHE_DIR = os.environ.get("PDFEXTRACT_RASTER_CACHE") or None
+RASTER_CACHE_MAX_BYTES = int(os.environ.get("PDFEXTRACT_RASTER_CACHE_MB", "1024")) * 1024 * 1024
+# Whitespace and hyphens are ignored when fuzzy-matching OCR words
+_STRIP_WS_HYPHEN = str.maketrans("", "", " \n\t\r-")
+
+# One tesserocr API per process and language, shared by every OcrReader, so the
+# language models are loaded once per (worker) process instead of once per file
+_shared_apis: Dict[str, "PyTessBaseAPI"] = {}
+_api_images: Dict[str, Image.Image] = {}  # Page image currently set on each API
+
+
+def _get_shared_api(lang: str):
+    """Returns the API of this process for lang, creating it on first use."""
+    if lang not in _shared_apis:
+        _shared_apis[lang] = PyTessBaseAPI(lang=lang, oem=OEM.LSTM_ONLY)
+    return _shared_apis[lang]
+
+
+def warm_up_tesseract(lang: str = "eng+deu") -> None:
+    """
+    Loads the Tesseract language models ahead of the first box, e.g. as a
+    process pool initializer. With pytesseract this only primes the OS file
+    cache, since every call starts a new tesseract process.
+    """
+    try:
+        if PyTessBaseAPI is None:
+            blank = Image.new("L", (32, 32), color=255)
+            pytesseract.image_to_string(blank, lang=lang, config=DEFAULT_TESSERACT_CONFIG)
+        else:
+            _get_shared_api(lang)
+    except Exception as e:
+        log(f"Tesseract warm-up failed: {e}")
+
+
+def _parse_tesseract_config(config: str) -> Tuple[Optional[int], Dict[str, str]]:
+    """
+    Splits a tesseract command line config into its page segmentation mode
+    and its -c variables, for use with the tesserocr API.
+    """
+    args = shlex.split(config)
+    psm = None
+    variables = {}
+    for flag, value in zip(args, args[1:]):
+        if flag == "--psm":
+            psm = int(value)
+        elif flag == "-c":
+            key, _, val = value.partition("=")
+            variables[key] = val
+    return psm, variables
+
+
+def _clean_ocr_text(raw_text: str) -> Optional[str]:
+    """
+    Cleans up line breaks and hyphenation artifacts; returns None for text too short to be a value.
+    """
+    cleaned_text = raw_text.strip().replace("-\n", "").replace("\n", " ").strip()
+
+    if not cleaned_text or len(cleaned_text) < 3 or not re.search(r'\w', cleaned_text):
+        return None
+
+    return cleaned_text
+
 
 class OcrReader(BoxReader):
-    def __init__(self, filename: str, debug_dir: str = "./debug_ocr", lang: str = "eng+deu"):
+    def __init__(
+            self,
+            filename: str,
+            debug_dir: str = "./debug_ocr",
+            lang: str = "eng+deu",
+            raster_cache_dir: Optional[str] = RASTER_CACHE_DIR
+    ):
+        """
+        :param filename:
+        :param debug_dir: where debug images are written
+        :param lang: Tesseract languages
+        :param raster_cache_dir: directory to keep page renders in across runs; None disables it
+        """
         self.filename = filename
         self.debug_dir = debug_dir
         self.lang = lang
-        self._page_image_cache: Dict[int, Image.Image] = {}
+        self.raster_cache_dir = raster_cache_dir
+        # Rendered pages keyed by (page, dpi), shared by every box read from this reader
+        self._page_image_cache: Dict[Tuple[int, int], Image.Image] = {}
+        # Pixels of the cached renders, for the pytesseract path to slice boxes from
+        self._page_array_cache: Dict[Tuple[int, int], np.ndarray] = {}
+        # Words of a whole-page OCR pass keyed by (page, dpi), see read_text_from_boxes
+        self._page_words_cache: Dict[Tuple[int, int], Dict[str, np.ndarray]] = {}
         os.makedirs(self.debug_dir, exist_ok=True)
 
-    def _get_page_image(self, page: int, dpi: int = 300) -> Image.Image:
+    def close(self):
+        """Release the rendered pages; the shared tesserocr API stays loaded for the next file."""
+        _api_images.pop(self.lang, None)
+        self._page_image_cache.clear()
+        self._page_array_cache.clear()
+        self._page_words_cache.clear()
+
+    def _get_api(self):
+        return _get_shared_api(self.lang)
+
+    def _set_api_image(self, api, image: Image.Image) -> None:
+        """
+        Hands a page image to the API, unless it is already set; every box of
+        the page is then read by only moving the rectangle.
+        """
+        if _api_images.get(self.lang) is not image:
+            api.SetImage(image)
+            _api_images[self.lang] = image
+
+    def _ocr_region(self, page: int, dpi: int, box: Tuple[int, int, int, int], config: str) -> str:
+        """
+        Runs OCR on a region of a rendered page, in-process through tesserocr if available.
+        """
+        x0, y0, x1, y1 = box
+        if PyTessBaseAPI is None:
+            # pytesseract accepts arrays; slicing the page array avoids a PIL crop per box
+            region = self._get_page_array(page, dpi)[y0:y1, x0:x1]
+            return pytesseract.image_to_string(region, lang=self.lang, config=config)
+
+        image = self._get_page_image(page, dpi)
+        psm, variables = _parse_tesseract_config(config)
+        api = self._get_api()
+        api.SetPageSegMode(psm if psm is not None else PSM.SINGLE_BLOCK)
+        for key, value in variables.items():
+            api.SetVariable(key, value)
+        try:
+            self._set_api_image(api, image)
+            api.SetRectangle(x0, y0, x1 - x0, y1 - y0)
+            return api.GetUTF8Text()
+        finally:
+            # Variables persist on the API; reset them (e.g. the whitelist) for the next box
+            for key in variables:
+                api.SetVariable(key, "")
+
+    def _get_page_image(self, page: int, dpi: int = BOX_DPI) -> Image.Image:
         """
         Convert and cache a specific page of the PDF to an image.
+        Each (page, dpi) is rendered only once; boxes are cropped from the cached image.
+        """
+        key = (page, dpi)
+        if key not in self._page_image_cache:
+            image = self._load_cached_render(page, dpi)
+            if image is None:
+                image = self._convert_pages(page, page, dpi)[0]
+                self._save_cached_render(page, dpi, image)
+            self._remember_image(key, image)
+        return self._page_image_cache[key]
+
+    def _get_page_array(self, page: int, dpi: int = BOX_DPI) -> np.ndarray:
+        """
+        The cached render of a page as a uint8 array, converted once per (page, dpi).
+        """
+        key = (page, dpi)
+        image = self._get_page_image(page, dpi)
+        if key not in self._page_array_cache:
+            self._page_array_cache[key] = np.asarray(image, dtype=np.uint8)
+        return self._page_array_cache[key]
+
+    def prefetch_pages(self, pages: Iterable[int], dpi: int = BOX_DPI) -> None:
+        """
+        Renders the given pages that are not cached yet with one Poppler call per run
+        of consecutive pages, instead of starting Poppler and parsing the PDF once per
+        page; pages between the runs are never rendered. Only the first
+        MAX_CACHED_IMAGES of them are rendered ahead, since more would be evicted
+        from memory before they are read; the rest are rendered on demand.
+        :param pages: zero-based page indexes
+        :param dpi: resolution to render the pages at
+        """
+        uncached = sorted({page for page in pages if not self._has_cached_render(page, dpi)})
+        missing = uncached[:MAX_CACHED_IMAGES]
+
+        runs: List[Tuple[int, int]] = []
+        for page in missing:
+            if runs and page == runs[-1][1] + 1:
+                runs[-1] = (runs[-1][0], page)
+            else:
+                runs.append((page, page))
+
+        for first, last in runs:
+            for page, image in zip(range(first, last + 1), self._convert_pages(first, last, dpi)):
+                self._save_cached_render(page, dpi, image)
+                self._remember_image((page, dpi), image)
+
+    def _remember_image(self, key: Tuple[int, int], image: Image.Image) -> None:
+        """Keeps a render in memory, evicting the oldest one to bound memory."""
+        if key not in self._page_image_cache and len(self._page_image_cache) >= MAX_CACHED_IMAGES:
+            evicted = next(iter(self._page_image_cache))
+            evicted_image = self._page_image_cache.pop(evicted)
+            self._page_array_cache.pop(evicted, None)
+            # Don't let the shared API keep the evicted page alive
+            if _api_images.get(self.lang) is evicted_image:
+                del _api_images[self.lang]
+        self._page_image_cache[key] = image
+        self._page_array_cache.pop(key, None)
+
+    def _convert_pages(self, first: int, last: int, dpi: int) -> List[Image.Image]:
+        """
+        Renders the zero-based page range first..last with Poppler.
+        OCR does not need colour, and pdftocairo renders faster than pdftoppm.
         """
-        if page not in self._page_image_cache:
-            images = convert_from_path(self.filename, first_page=page + 1, last_page=page + 1, dpi=dpi)
-            self._page_image_cache[page] = images[0]
-        return self._page_image_cache[page]
+        return convert_from_path(
+            self.filename,
+            first_page=first + 1,
+            last_page=last + 1,
+            dpi=dpi,
+            fmt="png",
+            grayscale=True,
+            use_pdftocairo=True,
+            thread_count=os.cpu_count() or 1
+        )
+
+    def _raster_cache_path(self, page: int, dpi: int) -> Optional[str]:
+        """
+        Disk cache location of a render, or None if the disk cache is disabled;
+        the key changes whenever the PDF is modified.
+        """
+        if not self.raster_cache_dir:
+            return None
+        stat = os.stat(self.filename)
+        key = hashlib.blake2b(
+            f"{os.path.abspath(self.filename)}:{stat.st_mtime}:{stat.st_size}:{page}:{dpi}".encode(),
+            digest_size=16
+        ).hexdigest()
+        return os.path.join(self.raster_cache_dir, key + ".png")
+
+    def _has_cached_render(self, page: int, dpi: int) -> bool:
+        """Whether a render is cached in memory or on disk."""
+        if (page, dpi) in self._page_image_cache:
+            return True
+        cache_path = self._raster_cache_path(page, dpi)
+        return cache_path is not None and os.path.exists(cache_path)
+
+    def _load_cached_render(self, page: int, dpi: int) -> Optional[Image.Image]:
+        """Loads a render of a previous run from the disk cache, if there is one."""
+        cache_path = self._raster_cache_path(page, dpi)
+        if cache_path is None:
+            return None
+        try:
+            with Image.open(cache_path) as cached:
+                cached.load()
+            # Mark as recently used, so pruning removes the stale renders first
+            os.utime(cache_path)
+            return cached
+        except OSError:
+            # Missing, or pruned by another process in the meantime
+            return None
+
+    def _save_cached_render(self, page: int, dpi: int, image: Image.Image) -> None:
+        """Stores a render in the disk cache, if it is enabled."""
+        cache_path = self._raster_cache_path(page, dpi)
+        if cache_path is None:
+            return
+        os.makedirs(self.raster_cache_dir, exist_ok=True)
+        # Write under a temporary name, so parallel workers never read a partial file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, format="PNG", optimize=False, compress_level=1)
+        os.replace(tmp_path, cache_path)
+        self._prune_raster_cache()
+
+    def _prune_raster_cache(self) -> None:
+        """Deletes the least recently used renders once the disk cache outgrows RASTER_CACHE_MAX_BYTES."""
+        entries = []
+        with os.scandir(self.raster_cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".png"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= RASTER_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already removed by another process
+            total -= size
+
+    @staticmethod
+    def choose_dpi(boxes: List[Tuple[int, int, int, int]]) -> int:
+        """
+        Picks the render resolution from the size of the smallest of the boxes.
+        Tesseract time grows with the pixel count, so large boxes are read from
+        a coarser render, while small text keeps the full resolution.
+        :param boxes: boxes in BOX_DPI pixel coordinates
+        :return: dpi to render the page at
+        """
+        low_dpi, medium_dpi, high_dpi = DPI_STEPS
+        side = min(min(x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes) * low_dpi / BOX_DPI
+        if side < SMALL_BOX_PX:
+            return high_dpi
+        if side < LARGE_BOX_PX:
+            return medium_dpi
+        return low_dpi
 
     def read_text_from_box(
             self,
             page: int,
-            box: Tuple[int, int, int, int]
+            box: Tuple[int, int, int, int],
+            config: Optional[str] = None,
+            dpi: int = BOX_DPI
     ) -> Optional[str]:
         """
         Extracts text from a specific bounding box on a given PDF page using OCR.
         Handles multi-word text reliably by removing spaces/hyphens and returning
         both raw and normalized versions.
         :param page:
-        :param box:
+        :param box: box in BOX_DPI pixel coordinates
+        :param config: Tesseract options for this box, e.g. a single-line PSM and a character whitelist
+        :param dpi: resolution to render the page at; the box is scaled to match
         :return:
         """
         try:
-            image = self._get_page_image(page)
+            image = self._get_page_image(page, dpi)
 
-            # Ensure box is within image bounds
-            x0, y0, x1, y1 = map(int, box)
+            # Scale to the render resolution and ensure box is within image bounds
+            scale = dpi / BOX_DPI
+            x0, y0, x1, y1 = (int(round(v * scale)) for v in box)
             x0 = max(0, x0)
             y0 = max(0, y0)
             x1 = min(image.width, x1)
             y1 = min(image.height, y1)
+            # Boxes past the rendered page leave nothing to read; libtesseract
+            # crashes on the negative rectangle instead of raising
+            if x1 <= x0 or y1 <= y0:
+                return None
 
-            cropped_image = image.crop(box)
+            raw_text = self._ocr_region(page, dpi, (x0, y0, x1, y1), config or DEFAULT_TESSERACT_CONFIG)
+            return _clean_ocr_text(raw_text)
+        except Exception as e:
+            log(f"OCR error on box {box} (page {page + 1}): {e}")
+            return None
 
-            raw_text = pytesseract.image_to_string(
-                cropped_image,
+    def _ocr_page_words(self, image: Image.Image) -> Tuple[List[str], List[Tuple[int, int, int, int]]]:
+        """
+        Runs one OCR pass over a whole page and returns its words and their boxes, in reading order.
+        """
+        if PyTessBaseAPI is None:
+            data = pytesseract.image_to_data(
+                image,
                 lang=self.lang,
-                config="--psm 6 --oem 1"
-            ).strip()
+                output_type=pytesseract.Output.DICT,
+                config=PAGE_TESSERACT_CONFIG
+            )
+            # image_to_data lists words ordered by block, paragraph, line and word number
+            indices = [i for i, word in enumerate(data['text']) if word and word.strip()]
+            return (
+                [data['text'][i].strip() for i in indices],
+                [
+                    (data['left'][i], data['top'][i],
+                     data['left'][i] + data['width'][i], data['top'][i] + data['height'][i])
+                    for i in indices
+                ]
+            )
 
-            # Clean up line breaks and remove hyphenation artifacts
-            cleaned_text = raw_text.replace("-\n", "").replace("\n", " ").strip()
+        psm, _ = _parse_tesseract_config(PAGE_TESSERACT_CONFIG)
+        words, boxes = [], []
+        api = self._get_api()
+        api.SetPageSegMode(psm)
+        self._set_api_image(api, image)
+        api.SetRectangle(0, 0, image.width, image.height)
+        api.Recognize()
+        for word in iterate_level(api.GetIterator(), RIL.WORD):
+            text = word.GetUTF8Text(RIL.WORD)
+            if text and text.strip():
+                words.append(text.strip())
+                boxes.append(word.BoundingBox(RIL.WORD))
+        return words, boxes
 
-            if not cleaned_text or len(cleaned_text) < 3 or not re.search(r'\w', cleaned_text):
-                return None
+    def _get_page_words(self, page: int, dpi: int = BOX_DPI) -> Dict[str, np.ndarray]:
+        """
+        OCRs a whole page once and caches its words with their centers in BOX_DPI pixels.
+        """
+        key = (page, dpi)
+        if key not in self._page_words_cache:
+            try:
+                words, boxes = self._ocr_page_words(self._get_page_image(page, dpi))
+            except Exception as e:
+                # Remember the failure as a page without words instead of retrying for every field
+                log(f"OCR error on page {page + 1}: {e}")
+                words, boxes = [], []
+            # Column arrays, so each box lookup is a single vectorised mask
+            coords = np.asarray(boxes, dtype=np.float64).reshape(-1, 4) * (BOX_DPI / dpi)
+            self._page_words_cache[key] = {
+                'text': np.asarray(words, dtype=object),
+                'cx': (coords[:, 0] + coords[:, 2]) / 2,
+                'cy': (coords[:, 1] + coords[:, 3]) / 2,
+            }
+        return self._page_words_cache[key]
 
-            return cleaned_text
-        except Exception as e:
-            log(f"OCR error on box {box} (page {page + 1}): {e}")
-            return None
+    def read_text_from_boxes(
+            self,
+            page: int,
+            boxes: List[Tuple[int, int, int, int]],
+            dpi: int = BOX_DPI
+    ) -> List[Optional[str]]:
+        """
+        Reads several boxes of a page from a single OCR pass over the whole page. The
+        pass is slower than OCRing a few crops, so it is meant as a fallback shared by
+        all fields of a page. A word belongs to a box if its center lies inside it.
+        :param page:
+        :param boxes: boxes in BOX_DPI pixel coordinates
+        :param dpi: resolution to render the page at
+        :return: text per box, None where the box holds no usable text
+        """
+        words = self._get_page_words(page, dpi)
+        texts = []
+        for x0, y0, x1, y1 in boxes:
+            mask = (words['cx'] >= x0) & (words['cx'] <= x1) & (words['cy'] >= y0) & (words['cy'] <= y1)
+            texts.append(_clean_ocr_text(" ".join(words['text'][mask])))
+        return texts
 
     def find_text_coordinates(
             self,
@@ -93,7 +479,7 @@ class OcrReader(BoxReader):
                 config="--psm 6"
             )
 
-            search_normalized = search_text.lower().replace(" ", "").replace("-", "")
+            search_normalized = search_text.lower().translate(_STRIP_WS_HYPHEN)
 
             valid_indices = [
                 i for i, word in enumerate(data['text'])
@@ -106,34 +492,51 @@ class OcrReader(BoxReader):
             ]
 
             normalized_words = [
-                w.lower().replace(" ", "").replace("-", "") for w in words
+                w.lower().translate(_STRIP_WS_HYPHEN) for w in words
             ]
 
-            draw = ImageDraw.Draw(image)
+            # Box edges of the valid words, so a window's bounding box is a slice reduction
+            lefts = np.asarray(data['left'], dtype=np.int32)[valid_indices]
+            tops = np.asarray(data['top'], dtype=np.int32)[valid_indices]
+            rights = lefts + np.asarray(data['width'], dtype=np.int32)[valid_indices]
+            bottoms = tops + np.asarray(data['height'], dtype=np.int32)[valid_indices]
 
-            for idx, i in enumerate(valid_indices):
-                for window in range(1, 4):  # Try 1- to 3-word combinations
+            # All 1- to 3-word combinations; windows whose length is far off the
+            # search string can never reach the cutoff and are not scored at all
+            choices = []
+            windows = []
+            max_length_diff = len(search_normalized) * 0.2
+            for idx in range(len(valid_indices)):
+                joined = ''
+                for window in range(1, 4):
                     if idx + window > len(valid_indices):
+                        break
+                    # Grow the window by one word instead of re-joining it
+                    joined += normalized_words[idx + window - 1]
+                    if abs(len(joined) - len(search_normalized)) > max_length_diff:
                         continue
+                    choices.append(joined)
+                    windows.append(slice(idx, idx + window))
 
-                    j_indices = valid_indices[idx:idx + window]
-                    joined = ''.join([normalized_words[k] for k in range(idx, idx + window)])
-
-                    ratio = SequenceMatcher(None, joined, search_normalized).ratio()
+            hit = process.extractOne(search_normalized, choices, scorer=fuzz.ratio, score_cutoff=90)
+            if hit:
+                joined, _, choice_idx = hit
+                window = windows[choice_idx]
 
-                    if ratio > 0.9:
-                        # Matching window found, calculate bounding box
-                        x0 = min(data['left'][j] for j in j_indices) - tolerance
-                        y0 = min(data['top'][j] for j in j_indices) - tolerance
-                        x1 = max(data['left'][j] + data['width'][j] for j in j_indices) + tolerance
-                        y1 = max(data['top'][j] + data['height'][j] for j in j_indices) + tolerance
+                # Matching window found, calculate bounding box
+                x0 = int(lefts[window].min()) - tolerance
+                y0 = int(tops[window].min()) - tolerance
+                x1 = int(rights[window].max()) + tolerance
+                y1 = int(bottoms[window].max()) + tolerance
 
-                        draw.rectangle([(x0, y0), (x1, y1)], outline="red", width=2)
-                        debug_path = self._save_debug_image(image, self.filename, page + 1)
+                # Draw on an RGB copy so the cached (grayscale) page image stays clean for OCR
+                debug_image = image.convert("RGB")
+                ImageDraw.Draw(debug_image).rectangle([(x0, y0), (x1, y1)], outline="red", width=2)
+                debug_path = self._save_debug_image(debug_image, self.filename, page + 1)
 
-                        log(f"Fuzzy match '{search_text}' ≈ '{joined}' at {x0, y0, x1, y1}")
-                        log(f"Saved debug image: {debug_path}")
-                        return int(x0), int(y0), int(x1), int(y1)
+                log(f"Fuzzy match '{search_text}' ≈ '{joined}' at {x0, y0, x1, y1}")
+                log(f"Saved debug image: {debug_path}")
+                return int(x0), int(y0), int(x1), int(y1)
 
             log(f"'{search_text}' not found on page {page + 1}")
             return None
@@ -1,16 +1,57 @@
+import bisect
 import csv
 import os
 from typing import Tuple, Optional, List
 
 import pdfplumber
+from pdfplumber import PDF
+from pdfplumber.page import Page
 
 from src.readers.base_reader import BoxReader
 from src.logger import log
 
 
+def find_page(pdf: PDF, page: int) -> Optional[Page]:
+    """
+    Looks a page up by its zero-based number. PDFs opened with a pages= filter
+    only hold the selected pages, so their list index is not the page number.
+    :param pdf:
+    :param page: zero-based page number in the document
+    :return: the page, or None if the PDF does not hold it
+    """
+    pages = pdf.pages
+    if page < len(pages) and pages[page].page_number == page + 1:
+        return pages[page]
+    return next((p for p in pages if p.page_number == page + 1), None)
+
+
 class PdfReader(BoxReader):
-    def __init__(self, filename: str):
+    def __init__(self, filename: str, pdf: Optional[PDF] = None):
+        """
+        :param filename:
+        :param pdf: already opened PDF to read from; it stays owned by the caller
+        """
         self.filename = filename
+        self._pdf: Optional[PDF] = pdf  # Opened on first use and reused for every call
+        self._owns_pdf = pdf is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._pdf is not None:
+            if self._owns_pdf:
+                self._pdf.close()
+            self._pdf = None
+
+    def _get_pdf(self) -> PDF:
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(self.filename)
+            self._owns_pdf = True
+        return self._pdf
 
     def read_text_from_box(self, page: int, box: Tuple[int, int, int, int]) -> Optional[str]:
         """
@@ -19,12 +60,21 @@ class PdfReader(BoxReader):
         :return:
         """
         try:
-            with pdfplumber.open(self.filename) as pdf:
-                if page >= len(pdf.pages):
-                    # log(f"Page {page + 1} out of range in {self.filename}")
-                    return None
-                cropped = pdf.pages[page].within_bbox(box)
-                return cropped.extract_text().strip() if cropped else None
+            page_obj = find_page(self._get_pdf(), page)
+            if page_obj is None:
+                # log(f"Page {page + 1} out of range in {self.filename}")
+                return None
+
+            # Clip to the page: pdfplumber rejects boxes reaching past it, and
+            # boxes entirely outside of it or empty hold no text at all
+            x0, y0, x1, y1 = box
+            left, top, right, bottom = page_obj.bbox
+            x0, y0, x1, y1 = max(left, x0), max(top, y0), min(right, x1), min(bottom, y1)
+            if x1 <= x0 or y1 <= y0:
+                return None
+
+            cropped = page_obj.within_bbox((x0, y0, x1, y1))
+            return cropped.extract_text().strip() if cropped else None
         except Exception as e:
             # log(f"pdfplumber error while reading box {box} on page {page}: {e}")
             return None
@@ -33,25 +83,25 @@ class PdfReader(BoxReader):
                                 debug_mode: bool = False) -> List[List[str]]:
         all_rows = []
         try:
-            with pdfplumber.open(self.filename) as pdf:
-                for page_num, fields in page_fields.items():
-                    if page_num >= len(pdf.pages):
-                        log(f"Skipped {self.filename} (missing page {page_num + 1})")
-                        row = [self.filename, f"Page {page_num + 1}"] + ['PAGE_MISSING'] * len(fields)
-                        all_rows.append(row)
-                        continue
-
-                    page = pdf.pages[page_num]
-                    row = [self.filename, f"Page {page_num + 1}"]
-                    for field_name, box in fields.items():
-                        text = self.read_text_from_box(page_num, box)
-                        row.append(text or '-')
+            pdf = self._get_pdf()
+            for page_num, fields in page_fields.items():
+                page = find_page(pdf, page_num)
+                if page is None:
+                    log(f"Skipped {self.filename} (missing page {page_num + 1})")
+                    row = [self.filename, f"Page {page_num + 1}"] + ['PAGE_MISSING'] * len(fields)
                     all_rows.append(row)
+                    continue
+
+                row = [self.filename, f"Page {page_num + 1}"]
+                for field_name, box in fields.items():
+                    text = self.read_text_from_box(page_num, box)
+                    row.append(text or '-')
+                all_rows.append(row)
 
-                    if debug_mode:
-                        debug_img_path = os.path.join(debug_folder,
-                                                      f"{os.path.splitext(os.path.basename(self.filename))[0]}_page{page_num + 1}_debug.png")
-                        pdf.pages[page_num].to_image().save(debug_img_path)
+                if debug_mode:
+                    debug_img_path = os.path.join(debug_folder,
+                                                  f"{os.path.splitext(os.path.basename(self.filename))[0]}_page{page_num + 1}_debug.png")
+                    page.to_image().save(debug_img_path)
 
         except Exception as e:
             log(f"Error processing {self.filename}: {e}")
@@ -66,29 +116,28 @@ class PdfReader(BoxReader):
         output_csv = os.path.join(debug_folder, f"words_page{page_number + 1}_coords.csv")
 
         try:
-            with pdfplumber.open(self.filename) as pdf:
-                if page_number >= len(pdf.pages):
-                    log(f"Cannot debug. Page {page_number + 1} not found in {self.filename}")
-                    return
-
-                page = pdf.pages[page_number]
-                words = page.extract_words()
-
-                with open(output_csv, "w", newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Word", "x0", "top", "x1", "bottom"])
-                    for word in words:
-                        writer.writerow([word['text'], word['x0'], word['top'], word['x1'], word['bottom']])
-
-                im = page.to_image(resolution=150)
-                draw = im.draw
+            page = find_page(self._get_pdf(), page_number)
+            if page is None:
+                log(f"Cannot debug. Page {page_number + 1} not found in {self.filename}")
+                return
+
+            words = page.extract_words()
+
+            with open(output_csv, "w", newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Word", "x0", "top", "x1", "bottom"])
                 for word in words:
-                    bbox = (word['x0'], word['top'], word['x1'], word['bottom'])
-                    im.draw_rect(bbox, stroke="red", fill=None, stroke_width=1)
-                    draw.text((word['x0'] + 2, word['top']), word['text'], fill="red")
+                    writer.writerow([word['text'], word['x0'], word['top'], word['x1'], word['bottom']])
 
-                im.save(output_image)
-                log(f"Debugger image and CSV saved to: {debug_folder}")
+            im = page.to_image(resolution=150)
+            draw = im.draw
+            for word in words:
+                bbox = (word['x0'], word['top'], word['x1'], word['bottom'])
+                im.draw_rect(bbox, stroke="red", fill=None, stroke_width=1)
+                draw.text((word['x0'] + 2, word['top']), word['text'], fill="red")
+
+            im.save(output_image)
+            log(f"Debugger image and CSV saved to: {debug_folder}")
 
         except Exception as e:
             log(f"Error generating word debugger: {e}")
@@ -99,52 +148,43 @@ class PdfReader(BoxReader):
         boxes = []
 
         try:
-            with pdfplumber.open(self.filename) as pdf:
-                if page_number >= len(pdf.pages):
-                    log(f"Page {page_number + 1} not found in {self.filename}")
-                    return []
-
-                page = pdf.pages[page_number]
-                words = page.extract_words()
-                if not words:
-                    log(f"No words found on page {page_number + 1} of {self.filename}")
-                    return []
-
-                temp_phrase = ""
-                temp_coords = []
+            page = find_page(self._get_pdf(), page_number)
+            if page is None:
+                log(f"Page {page_number + 1} not found in {self.filename}")
+                return []
 
-                for word in words:
-                    word_text = word['text'].strip().lower()
-
-                    if word_text == search_text:
-                        x0 = round(word['x0']) - tolerance
-                        top = round(word['top']) - tolerance
-                        x1 = round(word['x1']) + tolerance
-                        bottom = round(word['bottom']) + tolerance
-                        return [(x0, top, x1, bottom)]
-
-                    if not temp_coords:
-                        if search_text.startswith(word_text):
-                            temp_phrase = word_text
-                            temp_coords = [word]
-                    else:
-                        temp_phrase += " " + word_text
-                        temp_coords.append(word)
-
-                        if temp_phrase.strip() == search_text:
-                            x0 = round(temp_coords[0]['x0']) - tolerance
-                            top = round(min(w['top'] for w in temp_coords)) - tolerance
-                            x1 = round(temp_coords[-1]['x1']) + tolerance
-                            bottom = round(max(w['bottom'] for w in temp_coords)) + tolerance
-                            return [(x0, top, x1, bottom)]
-
-                        elif not search_text.startswith(temp_phrase.strip()):
-                            temp_phrase = ""
-                            temp_coords = []
-
-                log(f"Phrase '{search_text}' not found on page {page_number + 1} of {self.filename}")
+            words = page.extract_words()
+            if not words:
+                log(f"No words found on page {page_number + 1} of {self.filename}")
                 return []
 
+            # Search the page as one lowercased string and map hits back to words;
+            # a hit only counts if it starts and ends on word boundaries
+            tokens = [word['text'].strip().lower() for word in words]
+            joined = " ".join(tokens)
+            starts = []
+            offset = 0
+            for token in tokens:
+                starts.append(offset)
+                offset += len(token) + 1
+
+            pos = joined.find(search_text) if search_text else -1
+            while pos != -1:
+                first = bisect.bisect_right(starts, pos) - 1
+                end = pos + len(search_text)
+                last = bisect.bisect_right(starts, end) - 1
+                if starts[first] == pos and starts[last] + len(tokens[last]) == end:
+                    matched = words[first:last + 1]
+                    x0 = round(matched[0]['x0']) - tolerance
+                    top = round(min(w['top'] for w in matched)) - tolerance
+                    x1 = round(matched[-1]['x1']) + tolerance
+                    bottom = round(max(w['bottom'] for w in matched)) + tolerance
+                    return [(x0, top, x1, bottom)]
+                pos = joined.find(search_text, pos + 1)
+
+            log(f"Phrase '{search_text}' not found on page {page_number + 1} of {self.filename}")
+            return []
+
         except Exception as e:
             log(f"Error finding coordinates in {self.filename}: {e}")
             return []